@@ -11,10 +11,10 @@ from entity.creature import AgentMonster
 class InterAction(BaseModel):
     action: str
     description: str
-    type: str
-    thought: str
-    mana_cost: int
-    power: int
+    type: str = "其他"
+    thought: str = ""
+    mana_cost: int = 0
+    power: int = 0
 
 
 class Observation(BaseModel):
@@ -137,11 +137,16 @@ def simulate_turn(active_agent: AgentMonster, environment: str, observation: Obs
     except Exception as e:
         print(f"[错误] 调用 LLM 失败: {e}")
         # 返回一个保底的行动，防止程序崩溃
-        return {
-            "action": "发呆",
-            "type": "其他",
-            "description": f"{active_agent.name} 似乎因为某些未知原因，愣在原地，什么也没做。",
-            "thought": "LLM API调用失败，执行备用方案。",
-            "mana_cost": 0,
-            "power": 0
-        }
+        return idle_action(active_agent, "LLM API调用失败，执行备用方案。")
+
+
+def idle_action(active_agent: AgentMonster, thought: str) -> dict:
+    """无法得到有效行动时的保底行动"""
+    return {
+        "action": "发呆",
+        "type": "其他",
+        "description": f"{active_agent.name} 似乎因为某些未知原因，愣在原地，什么也没做。",
+        "thought": thought,
+        "mana_cost": 0,
+        "power": 0
+    }
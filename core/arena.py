@@ -0,0 +1,112 @@
+from typing import Iterator, Optional, Union
+
+from pydantic import BaseModel, ValidationError
+
+from core.agent import simulate_turn, observe, idle_action, Observation, InterAction
+from core.model import call_model
+from entity.battle import check_health_loss, adjudicate, is_adjudication_turn, DEFAULT_ADJUDICATION_THRESHOLD
+from entity.creature import AgentMonster
+from prompt.prompt import create_creature_system_prompt
+
+DEFAULT_MAX_TURNS = 19
+
+
+class TurnEvent(BaseModel):
+    turn: int
+    # 行动方：0 为先手的 character，1 为 opponent
+    side: int
+    actor: str
+    observation: Observation
+    action: InterAction
+    hp: int
+    mp: int
+    opponent_hp: int
+    opponent_mp: int
+
+
+class BattleResult(BaseModel):
+    winner: str
+    winner_side: int
+    turns: int
+    adjudicated: bool = False
+    # 对手 HP 归零而结束
+    knockout: bool = False
+
+
+def create_monster(query: str) -> AgentMonster:
+    creature = call_model(system_prompt=create_creature_system_prompt,
+                          user_prompt=query,
+                          output_schema_class=AgentMonster)
+    if creature is None:
+        raise ValueError(f"无法根据描述生成角色: {query}")
+    creature.init_basic_status()
+    return creature
+
+
+def run_battle(character: AgentMonster, opponent: AgentMonster, environment: str,
+               max_turns: int = DEFAULT_MAX_TURNS,
+               threshold: float = DEFAULT_ADJUDICATION_THRESHOLD) -> Iterator[Union[TurnEvent, BattleResult]]:
+    """
+    进行一场战斗，每回合产出一个 TurnEvent，最后产出 BattleResult。
+
+    Args:
+        character: 先手行动的 Agent。
+        opponent: 后手行动的 Agent。
+        environment: 战斗环境。
+        max_turns: 最大回合数。
+        threshold: 提前裁定胜负的胜率阈值。
+    """
+    history = []
+    active_agent = character
+    active_side = 0
+    observation = Observation()
+    battle_stat = dict()
+    battle_stat["power"] = 0
+    winner: Optional[AgentMonster] = None
+    adjudicated = False
+    knockout = False
+    turn = 0
+
+    for turn in range(1, max_turns + 1):
+        observation = observe(active_agent, environment, history, observation.impression, battle_stat)
+        if observation is None:
+            observation = Observation()
+        if observation.damage:
+            active_agent.hp -= observation.damage
+
+        action_result = simulate_turn(active_agent, environment, observation, history[-4:])
+        try:
+            action = InterAction.model_validate(action_result)
+        except ValidationError as e:
+            print(f"[错误] LLM 返回的行动无效: {e}")
+            action = InterAction.model_validate(idle_action(active_agent, "LLM 返回的行动无效，执行备用方案。"))
+        if action.mana_cost:
+            active_agent.mp -= action.mana_cost
+
+        history.append(f"第{turn}回合, {active_agent.name}: {action.description}")
+        yield TurnEvent(turn=turn, side=active_side, actor=active_agent.name, observation=observation, action=action,
+                        hp=active_agent.hp, mp=active_agent.mp, opponent_hp=opponent.hp, opponent_mp=opponent.mp)
+
+        if opponent.hp <= 0:
+            winner = active_agent
+            knockout = True
+            break
+
+        # 双方都行动过后，若胜负已足够明朗则提前裁定，节省后续的 LLM 调用
+        if is_adjudication_turn(turn):
+            winner = adjudicate(active_agent, opponent, threshold)
+            if winner:
+                adjudicated = True
+                break
+
+        # 交换行动方
+        active_agent, opponent = opponent, active_agent
+        active_side = 1 - active_side
+
+    if winner is None:
+        p1_hp_remains = check_health_loss(active_agent)
+        p2_hp_remains = check_health_loss(opponent)
+        winner = active_agent if p1_hp_remains > p2_hp_remains else opponent
+    winner_side = active_side if winner is active_agent else 1 - active_side
+    yield BattleResult(winner=winner.name, winner_side=winner_side, turns=turn,
+                       adjudicated=adjudicated, knockout=knockout)
@@ -0,0 +1,312 @@
+import asyncio
+import copy
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Set
+
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, model_validator
+
+from core.arena import create_monster, run_battle, BattleResult, DEFAULT_MAX_TURNS
+from entity.battle import DEFAULT_ADJUDICATION_THRESHOLD
+from entity.creature import AgentMonster
+from memory.arena_store import ArenaStore
+from memory.valhalla import summon_from_valhalla
+
+# 同时进行的战斗数量，每场战斗占用一个工作线程
+BATTLE_WORKERS = int(os.environ.get("BATTLE_WORKERS", 4))
+# 设置后每回合与战斗结果都会写入该目录下的列式存储
+ARENA_STORE = os.environ.get("ARENA_STORE")
+# 已结束的战斗保留多少秒，过期后连同事件一起清除
+JOB_TTL = float(os.environ.get("JOB_TTL", 3600))
+# 单场战斗允许的最大回合数
+MAX_TURNS_LIMIT = 200
+# 最多缓存多少个英灵殿角色
+MAX_TEMPLATES = 128
+
+
+class Combatant(BaseModel):
+    """参战者：通过英灵殿的键召唤，或直接给出 AgentMonster 的 JSON"""
+    valhalla: Optional[str] = None
+    creature: Optional[dict] = None
+
+    @model_validator(mode="after")
+    def _check_source(self) -> 'Combatant':
+        if (self.valhalla is None) == (self.creature is None):
+            raise ValueError("参战者必须且只能提供 valhalla 或 creature 之一。")
+        return self
+
+
+class BattleRequest(BaseModel):
+    character: Combatant
+    opponent: Combatant
+    environment: str
+    max_turns: int = Field(default=DEFAULT_MAX_TURNS, ge=1, le=MAX_TURNS_LIMIT)
+    # 大于 1 时关闭提前裁定
+    threshold: float = Field(default=DEFAULT_ADJUDICATION_THRESHOLD, gt=0.5)
+
+
+class BattleJob:
+    """一场排队中或进行中的战斗，保存已发生的事件并推送给订阅者"""
+
+    def __init__(self, request: BattleRequest):
+        self.id = uuid.uuid4().hex
+        self.request = request
+        self.status = "queued"
+        self.finished_at: Optional[float] = None
+        self.events: List[dict] = []
+        self.subscribers: Set[asyncio.Queue] = set()
+
+    def publish(self, event: dict, status: Optional[str] = None):
+        if status:
+            self.status = status
+            if self.done:
+                self.finished_at = time.monotonic()
+        self.events.append(event)
+        for queue in self.subscribers:
+            queue.put_nowait(event)
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("finished", "failed")
+
+    async def stream(self):
+        """先回放已有事件，再持续产出新事件，直到战斗结束"""
+        queue = asyncio.Queue()
+        for event in self.events:
+            queue.put_nowait(event)
+        self.subscribers.add(queue)
+        try:
+            while True:
+                if self.done and queue.empty():
+                    return
+                event = await queue.get()
+                yield event
+                if event["event"] in ("result", "error"):
+                    return
+        finally:
+            self.subscribers.discard(queue)
+
+
+_templates: Dict[str, AgentMonster] = {}
+_template_locks: Dict[str, threading.Lock] = {}
+_templates_lock = threading.Lock()
+
+
+def _summon_template(key: str) -> AgentMonster:
+    """每个英灵殿角色只生成一次；同一个键的并发请求会等待第一次生成完成"""
+    with _templates_lock:
+        lock = _template_locks.setdefault(key, threading.Lock())
+    with lock:
+        template = _templates.get(key)
+        if template is None:
+            template = create_monster(summon_from_valhalla(key))
+            with _templates_lock:
+                if len(_templates) >= MAX_TEMPLATES:
+                    oldest = next(iter(_templates))
+                    del _templates[oldest]
+                    _template_locks.pop(oldest, None)
+                _templates[key] = template
+    return template
+
+
+def resolve_combatant(combatant: Combatant) -> AgentMonster:
+    """得到一份可以在战斗中修改的角色副本，英灵殿角色只会生成一次"""
+    if combatant.valhalla is not None:
+        creature = copy.deepcopy(_summon_template(combatant.valhalla))
+    else:
+        creature = AgentMonster.from_dict(combatant.creature)
+    creature.init_basic_status()
+    return creature
+
+
+def _record(record, *args):
+    """写入分析存储；存储出错只记录日志，不影响战斗本身"""
+    try:
+        record(*args)
+    except Exception as e:
+        print(f"[错误] 写入战斗存储失败: {e}")
+
+
+class BattleService:
+    """常驻的战斗服务：任务排队，由固定数量的 worker 并发执行"""
+
+    def __init__(self, workers: int = BATTLE_WORKERS, store: Optional[ArenaStore] = None,
+                 job_ttl: float = JOB_TTL):
+        self.workers = workers
+        self.store = store
+        self.job_ttl = job_ttl
+        self.jobs: Dict[str, BattleJob] = {}
+        self.queue: Optional[asyncio.Queue] = None
+        self.accepting = False
+        self._tasks: List[asyncio.Task] = []
+        self._running: Set[asyncio.Future] = set()
+        self._stopping = threading.Event()
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self.accepting = True
+        self._stopping.clear()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        if self.store:
+            self._tasks.append(asyncio.create_task(self._flush_periodically()))
+
+    async def stop(self):
+        """不再接受新任务，通知进行中的战斗在当前回合后结束，等待它们退出后再写盘"""
+        self.accepting = False
+        self._stopping.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await asyncio.gather(*self._running, return_exceptions=True)
+        while not self.queue.empty():
+            job = self.queue.get_nowait()
+            job.publish({"event": "error", "data": {"message": "服务已停止。"}}, "failed")
+        if self.store:
+            self.store.flush()
+
+    def evict_finished(self):
+        """清除结束超过 job_ttl 秒的战斗"""
+        deadline = time.monotonic() - self.job_ttl
+        expired = [job_id for job_id, job in self.jobs.items()
+                   if job.finished_at is not None and job.finished_at < deadline]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    def submit(self, request: BattleRequest) -> BattleJob:
+        if not self.accepting:
+            raise RuntimeError("服务正在停止，不再接受新的战斗。")
+        self.evict_finished()
+        job = BattleJob(request)
+        self.jobs[job.id] = job
+        self.queue.put_nowait(job)
+        return job
+
+    async def _flush_periodically(self):
+        """空闲时也按 flush_interval 将缓冲的回合与结果写盘"""
+        while True:
+            await asyncio.sleep(self.store.flush_interval)
+            try:
+                await asyncio.to_thread(self.store.flush_stale)
+            except Exception as e:
+                print(f"[错误] 写入战斗存储失败: {e}")
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            # 线程中的战斗无法被取消；shield 保证 worker 被取消时由 stop() 继续等待它
+            battle = asyncio.ensure_future(
+                asyncio.to_thread(self._run, job, asyncio.get_running_loop(), self.store, self._stopping))
+            self._running.add(battle)
+            battle.add_done_callback(self._running.discard)
+            try:
+                await asyncio.shield(battle)
+            finally:
+                self.queue.task_done()
+
+    @staticmethod
+    def _run(job: BattleJob, loop: asyncio.AbstractEventLoop, store: Optional[ArenaStore] = None,
+             stopping: Optional[threading.Event] = None):
+        """在工作线程中进行战斗，事件通过事件循环线程安全地发布"""
+        def publish(event: dict, status: Optional[str] = None):
+            loop.call_soon_threadsafe(job.publish, event, status)
+
+        loop.call_soon_threadsafe(setattr, job, "status", "running")
+        try:
+            request = job.request
+            character = resolve_combatant(request.character)
+            opponent = resolve_combatant(request.opponent)
+            combatants = (character, opponent)
+            battle = store.new_battle() if store else None
+            for event in run_battle(character, opponent, request.environment,
+                                    max_turns=request.max_turns, threshold=request.threshold):
+                if isinstance(event, BattleResult):
+                    if store:
+                        _record(store.record_result, battle, event, character, opponent)
+                    publish({"event": "result", "data": event.model_dump()}, "finished")
+                else:
+                    if store:
+                        _record(store.record_turn, battle, event,
+                                combatants[event.side], combatants[1 - event.side])
+                    publish({"event": "turn", "data": event.model_dump()})
+                    # 服务停止时在当前回合结束后中断，不再发起新的 LLM 调用
+                    if stopping is not None and stopping.is_set():
+                        publish({"event": "error", "data": {"message": "服务已停止，战斗中断。"}}, "failed")
+                        return
+        except Exception as e:
+            publish({"event": "error", "data": {"message": str(e)}}, "failed")
+
+
+service = BattleService(store=ArenaStore(ARENA_STORE) if ARENA_STORE else None)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await service.start()
+    try:
+        yield
+    finally:
+        await service.stop()
+
+
+app = FastAPI(title="AgentMonster Battle Service", lifespan=lifespan)
+
+
+def _get_job(job_id: str) -> BattleJob:
+    service.evict_finished()
+    job = service.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No battle found with id: {job_id}")
+    return job
+
+
+@app.post("/battles")
+async def submit_battle(request: BattleRequest):
+    if not service.accepting:
+        raise HTTPException(status_code=503, detail="Battle service is shutting down.")
+    job = service.submit(request)
+    return {"id": job.id, "status": job.status}
+
+
+@app.get("/battles/{job_id}")
+async def get_battle(job_id: str):
+    job = _get_job(job_id)
+    return {"id": job.id, "status": job.status, "events": job.events}
+
+
+@app.get("/battles/{job_id}/events")
+async def stream_battle(job_id: str):
+    """以 Server-Sent Events 推送每回合的 Observation / InterAction"""
+    job = _get_job(job_id)
+
+    async def sse():
+        async for event in job.stream():
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'], ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(sse(), media_type="text/event-stream")
+
+
+@app.websocket("/battles/{job_id}/ws")
+async def watch_battle(websocket: WebSocket, job_id: str):
+    job = service.jobs.get(job_id)
+    if job is None:
+        await websocket.close(code=4404)
+        return
+    await websocket.accept()
+    try:
+        async for event in job.stream():
+            await websocket.send_json(event)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run(app, host="127.0.0.1", port=int(os.environ.get("PORT", 8000)))
@@ -1,4 +1,20 @@
-from entity.creature import AgentMonster, character_r
+import json
+import math
+import sys
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+from entity.creature import AgentMonster, character_r, character_saber
+
+# 胜率超过该阈值时提前裁定胜负，不再继续调用 LLM
+DEFAULT_ADJUDICATION_THRESHOLD = 0.9
+# 胜率不可能达到的阈值，用于关闭提前裁定
+ADJUDICATION_DISABLED = float("inf")
+# 每回合消耗的 LLM 调用次数（observe + simulate_turn）
+LLM_CALLS_PER_TURN = 2
+# 评估提前裁定时默认比较的阈值
+DEFAULT_EVALUATION_THRESHOLDS = (0.6, 0.7, 0.8, 0.9, 0.95, 0.99)
 
 
 def check_health_loss(character: AgentMonster):
@@ -11,8 +27,164 @@ def check_health_loss(character: AgentMonster):
     return curr_hp / max_hp, max_hp - curr_hp
 
 
+def estimate_offense(character: AgentMonster, opponent: AgentMonster) -> float:
+    """根据战斗属性、剩余MP与仍可释放的技能估算角色每回合对 opponent 的输出"""
+    combat_stat = character.ability_scores.derive_combat_stats()
+    evasion = opponent.ability_scores.derive_combat_stats()["evasion"]
+    base = max(combat_stat["patk"], combat_stat["matk"])
+    accuracy = combat_stat["hit"] / max(combat_stat["hit"] + evasion / 2, 1.0)
+
+    # 仍能负担 MP 消耗的技能越多，角色后续的爆发潜力越大
+    if character.skills:
+        affordable = sum(1 for skill in character.skills if skill.mana_cost <= max(character.mp, 0))
+        skill_reserve = affordable / len(character.skills)
+    else:
+        skill_reserve = 0.0
+    mp_ratio = min(max(character.mp, 0) / (combat_stat["mp"] or 1), 1.0)
+
+    return base * accuracy * (1 + 0.5 * skill_reserve + 0.25 * mp_ratio)
+
+
+def estimate_win_probability(character: AgentMonster, opponent: AgentMonster) -> float:
+    """
+    估算 character 战胜 opponent 的概率。
+
+    比较双方击倒对手所需的回合数（对手剩余HP / 己方估算输出），再经 logistic 映射为概率。
+    """
+    if opponent.hp <= 0 < character.hp:
+        return 1.0
+    if character.hp <= 0 < opponent.hp:
+        return 0.0
+    if character.hp <= 0 and opponent.hp <= 0:
+        return 0.5
+
+    turns_to_win = opponent.hp / max(estimate_offense(character, opponent), 1.0)
+    turns_to_lose = character.hp / max(estimate_offense(opponent, character), 1.0)
+    return 1 / (1 + math.exp(-2 * math.log(turns_to_lose / turns_to_win)))
+
+
+def is_adjudication_turn(turn: int) -> bool:
+    """只在双方都行动过的回合结束时尝试裁定"""
+    return turn % 2 == 0
+
+
+def adjudicate(character: AgentMonster, opponent: AgentMonster,
+               threshold: float = DEFAULT_ADJUDICATION_THRESHOLD) -> Optional[AgentMonster]:
+    """若一方胜率达到阈值则返回该方，否则返回 None 表示战斗继续"""
+    probability = estimate_win_probability(character, opponent)
+    if probability >= threshold:
+        return character
+    if 1 - probability >= threshold:
+        return opponent
+    return None
+
+
+@dataclass
+class BattleReplay:
+    """一场已完成战斗的记录，用于评估提前裁定的效果"""
+    character: AgentMonster
+    opponent: AgentMonster
+    # 胜者：0 为 character，1 为 opponent
+    winner: int
+    # 每回合结束时的 (character.hp, character.mp, opponent.hp, opponent.mp)
+    vitals: List[Tuple[int, int, int, int]] = field(default_factory=list)
+
+    def record(self, character: AgentMonster, opponent: AgentMonster):
+        """记录当前回合的HP/MP，参数须按 self.character / self.opponent 的顺序传入"""
+        self.vitals.append((character.hp, character.mp, opponent.hp, opponent.mp))
+
+    def to_dict(self) -> dict:
+        return {
+            "character": self.character.to_dict(),
+            "opponent": self.opponent.to_dict(),
+            "winner": self.winner,
+            "vitals": self.vitals,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'BattleReplay':
+        return cls(
+            character=AgentMonster.from_dict(data["character"]),
+            opponent=AgentMonster.from_dict(data["opponent"]),
+            winner=data["winner"],
+            vitals=[tuple(vital) for vital in data["vitals"]],
+        )
+
+
+def save_replay(path, replay: BattleReplay):
+    """以 JSON Lines 格式将一场回放追加到 path"""
+    with open(path, "a", encoding="utf-8") as file:
+        file.write(json.dumps(replay.to_dict(), ensure_ascii=False) + "\n")
+
+
+def load_replays(path) -> List[BattleReplay]:
+    """读取 save_replay 写入的回放集"""
+    with open(path, "r", encoding="utf-8") as file:
+        return [BattleReplay.from_dict(json.loads(line)) for line in file if line.strip()]
+
+
+def evaluate_adjudication(replays: List[BattleReplay],
+                          threshold: float = DEFAULT_ADJUDICATION_THRESHOLD) -> dict:
+    """
+    在回放集上评估提前裁定：统计节省的 LLM 调用次数、被裁定的战斗比例（coverage），
+    以及被裁定的战斗中裁定结果与实际结果的一致率（agreement）。
+    回放应来自未开启提前裁定、完整进行的战斗。
+    """
+    calls_total = 0
+    calls_saved = 0
+    adjudicated = 0
+    agreed = 0
+
+    for replay in replays:
+        calls_total += len(replay.vitals) * LLM_CALLS_PER_TURN
+        for turn, (hp_a, mp_a, hp_b, mp_b) in enumerate(replay.vitals, start=1):
+            if not is_adjudication_turn(turn):
+                continue
+            character = replace(replay.character, hp=hp_a, mp=mp_a)
+            opponent = replace(replay.opponent, hp=hp_b, mp=mp_b)
+            winner = adjudicate(character, opponent, threshold)
+            if winner is None:
+                continue
+            adjudicated += 1
+            calls_saved += (len(replay.vitals) - turn) * LLM_CALLS_PER_TURN
+            if winner is (character, opponent)[replay.winner]:
+                agreed += 1
+            break
+
+    return {
+        "threshold": threshold,
+        "battles": len(replays),
+        "adjudicated": adjudicated,
+        "coverage": adjudicated / len(replays) if replays else 0.0,
+        "calls_total": calls_total,
+        "calls_saved": calls_saved,
+        "agreement": agreed / adjudicated if adjudicated else None,
+    }
+
+
+def report_adjudication(replays: List[BattleReplay],
+                        thresholds: Iterable[float] = DEFAULT_EVALUATION_THRESHOLDS):
+    """打印不同阈值下节省的调用次数与一致率"""
+    print(f"Replays: {len(replays)}")
+    print(f"{'threshold':>9} {'coverage':>8} {'saved':>11} {'agreement':>9}")
+    for threshold in thresholds:
+        stats = evaluate_adjudication(replays, threshold)
+        agreement = "-" if stats["agreement"] is None else f"{stats['agreement']:.3f}"
+        print(f"{threshold:>9.2f} {stats['coverage']:>8.3f} "
+              f"{stats['calls_saved']:>5}/{stats['calls_total']:<5} {agreement:>9}")
+
+
 if __name__ == '__main__':
+    # python -m entity.battle replays.jsonl [threshold ...]
+    if len(sys.argv) > 1:
+        thresholds = [float(arg) for arg in sys.argv[2:]] or DEFAULT_EVALUATION_THRESHOLDS
+        report_adjudication(load_replays(Path(sys.argv[1])), thresholds)
+        sys.exit()
+
     character_r.init_basic_status()
     character_r.hp -= 25
     ratio, loss = check_health_loss(character_r)
-    print(f"HP Remains: {ratio * 100:.3f}% (-{loss} pts.)")
\ No newline at end of file
+    print(f"HP Remains: {ratio * 100:.3f}% (-{loss} pts.)")
+
+    character_saber.init_basic_status()
+    print(f"P({character_r.name} wins): {estimate_win_probability(character_r, character_saber):.3f}")
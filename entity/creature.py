@@ -1,10 +1,46 @@
 import json
 import textwrap
-from dataclasses import dataclass, field, asdict
-from typing import List, Dict, ClassVar
+import weakref
+from dataclasses import dataclass, field, asdict, fields
+from typing import List, Dict, ClassVar, Optional, Tuple
 from dataclasses_jsonschema import JsonSchemaMixin
 
-@dataclass
+# 每回合都会变化的属性，序列化时不进入缓存
+VITAL_FIELDS = ("hp", "mp", "lv")
+
+# 注意：下列 dataclass 虽声明了 slots=True，字段存放在槽位中，但 JsonSchemaMixin 本身没有
+# __slots__，实例仍带有 __dict__ 与 __weakref__。名册的内存节省主要来自 Alignment / Skill 的驻留。
+
+
+class Interned:
+    """
+    不可变对象的驻留池：字段值相同的实例只保留一份。
+    子类需为 frozen dataclass，并声明自己的 _interned 类变量（WeakValueDictionary，
+    依赖 JsonSchemaMixin 提供的 __weakref__）。
+    """
+    __slots__ = ()
+
+    @classmethod
+    def intern(cls, obj):
+        key = tuple(getattr(obj, f.name) for f in fields(obj))
+        existing = cls._interned.get(key)
+        if existing is None:
+            cls._interned[key] = existing = obj
+        return existing
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+class _JsonCache:
+    """为 AgentMonster 提供不属于 dataclass 字段的缓存槽位"""
+    __slots__ = ("_json_cache",)
+
+
+@dataclass(slots=True)
 class AbilityScores(JsonSchemaMixin):
     STR: int  # 力量 Strength: 力气
     DEX: int  # 敏捷 Dexterity: 灵活性、反应能力和平衡感
@@ -53,7 +89,7 @@ class AbilityScores(JsonSchemaMixin):
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class InventoryItem(JsonSchemaMixin):
     name: str         # 物品名称
     durability: int   # 物品耐久度
@@ -65,12 +101,14 @@ class InventoryItem(JsonSchemaMixin):
             raise ValueError(f"耐久度不能为负数: {self.durability}")
 
 
-@dataclass
-class Skill(JsonSchemaMixin):
+@dataclass(frozen=True, slots=True)
+class Skill(JsonSchemaMixin, Interned):
     name: str         # 技能名
     mana_cost: int    # MP消耗
     description: str  # 技能描述
 
+    _interned: ClassVar[weakref.WeakValueDictionary] = weakref.WeakValueDictionary()
+
     def __post_init__(self):
         """验证MP消耗非负"""
         if self.mana_cost < 0:
@@ -78,8 +116,8 @@ class Skill(JsonSchemaMixin):
 
 
 
-@dataclass
-class Alignment(JsonSchemaMixin):
+@dataclass(frozen=True, slots=True)
+class Alignment(JsonSchemaMixin, Interned):
     abbreviation: str  # 阵营缩写，例如 "LG"
     name: str          # 阵营全称，例如 "Lawful Good"
     description: str   # 阵营描述
@@ -89,6 +127,7 @@ class Alignment(JsonSchemaMixin):
     _alignments: ClassVar[Dict[str, 'Alignment']] = {}
     # 存储所有阵营的字典，用于通过缩写索引
     # _alignments: Dict[str, 'Alignment'] = field(default_factory=dict)
+    _interned: ClassVar[weakref.WeakValueDictionary] = weakref.WeakValueDictionary()
 
     @classmethod
     def get_by_abbreviation(cls, abbreviation: str) -> 'Alignment':
@@ -101,12 +140,12 @@ class Alignment(JsonSchemaMixin):
         return cls._alignments
 
     def __post_init__(self):
-        """在实例化后将自身添加到 _alignments 字典"""
-        self._alignments[self.abbreviation.upper()] = self
+        """缩写首次出现时将自身添加到 _alignments 字典，之后的同缩写实例不会覆盖它"""
+        self._alignments.setdefault(self.abbreviation.upper(), self)
 
 
-@dataclass
-class AgentMonster(JsonSchemaMixin):
+@dataclass(slots=True)
+class AgentMonster(JsonSchemaMixin, _JsonCache):
     name: str
     description: str
     alignment: Alignment
@@ -117,6 +156,27 @@ class AgentMonster(JsonSchemaMixin):
     mp: int = 100
     lv: int = 0
 
+    def __post_init__(self):
+        """驻留阵营与技能，同一名册中相同的阵营、技能只保存一份"""
+        self.alignment = Alignment.intern(self.alignment)
+        self.skills = [Skill.intern(skill) for skill in self.skills]
+
+    def _static_key(self) -> tuple:
+        """
+        除 HP/MP/LV 外所有会进入 JSON 的值，用于判断缓存是否仍然有效。
+        包含能力值与物品的当前值，因此原地修改 ability_scores、skills、inventory 也会使缓存失效。
+        阵营与技能已驻留，比较时多为同一对象，开销很小。
+        """
+        scores = self.ability_scores
+        return (
+            self.name,
+            self.description,
+            self.alignment,
+            tuple(self.skills),
+            tuple(getattr(scores, name) for name in scores.__dataclass_fields__),
+            tuple((item.name, item.durability, item.description) for item in self.inventory),
+        )
+
     def init_basic_status(self):
         combat_stat = self.ability_scores.derive_combat_stats()
         self.hp = combat_stat["hp"]
@@ -149,12 +209,23 @@ class AgentMonster(JsonSchemaMixin):
         Returns:
             str: 代表该实例的 JSON 字符串。
         """
-        # asdict 会递归地将 dataclass 及其嵌套的 dataclass 转换为字典
-        obj_dict = asdict(self)
+        # 除 HP/MP/LV 外的字段只在首次或被修改后序列化一次，缓存为去掉结尾 "}" 的前缀
+        cache: Optional[Tuple[Optional[int], tuple, str]] = getattr(self, "_json_cache", None)
+        static_key = self._static_key()
+        if cache is None or cache[0] != indent or cache[1] != static_key:
+            # asdict 会递归地将 dataclass 及其嵌套的 dataclass 转换为字典
+            static_dict = asdict(self)
+            for name in VITAL_FIELDS:
+                del static_dict[name]
+            # ensure_ascii=False 确保中文字符等能正常显示，而不是被转义
+            static_json = json.dumps(static_dict, indent=indent, ensure_ascii=False)
+            cache = (indent, static_key, static_json[:-1].rstrip())
+            self._json_cache = cache
 
-        # json.dumps 将字典转换为 JSON 字符串
-        # ensure_ascii=False 确保中文字符等能正常显示，而不是被转义
-        return json.dumps(obj_dict, indent=indent, ensure_ascii=False)
+        # 将每回合变化的属性拼接在静态部分之后，结果与直接序列化整个实例一致
+        vitals_json = json.dumps({name: getattr(self, name) for name in VITAL_FIELDS}, indent=indent)
+        separator = "," if indent is not None else ", "
+        return cache[2] + separator + vitals_json[1:]
 
 
 
@@ -11,30 +11,30 @@ from config.secret import GEMINI_KEY
 from google import genai
 
 # setup_proxy()
-from core.agent import simulate_turn, observe, Observation
-from core.model import call_model
-from entity.battle import check_health_loss
-from entity.creature import AgentMonster
+from core.arena import create_monster, run_battle, BattleResult
+from entity.battle import BattleReplay, DEFAULT_ADJUDICATION_THRESHOLD, ADJUDICATION_DISABLED, save_replay
+from memory.arena_store import ArenaStore
 from memory.valhalla import summon_from_valhalla
-from prompt.prompt import create_creature_system_prompt
 
 os.environ["HTTP_PROXY"] = "http://127.0.0.1:7890"
 os.environ["HTTPS_PROXY"] = "http://127.0.0.1:7890"
 
+# 提前裁定胜负的胜率阈值，设为 1 以上可关闭提前裁定
+ADJUDICATION_THRESHOLD = float(os.environ.get("ADJUDICATION_THRESHOLD", DEFAULT_ADJUDICATION_THRESHOLD))
+# 设置后进入回放录制模式：关闭提前裁定，每场战斗都完整进行并追加到该回放集，
+# 之后用 python -m entity.battle <回放集> 评估提前裁定
+BATTLE_REPLAYS = os.environ.get("BATTLE_REPLAYS")
+if BATTLE_REPLAYS:
+    ADJUDICATION_THRESHOLD = ADJUDICATION_DISABLED
+# 设置后每回合与战斗结果都会写入该目录下的列式存储
+ARENA_STORE = os.environ.get("ARENA_STORE")
+
 client = OpenAI(
     api_key=GEMINI_KEY,
     base_url="https://generativelanguage.googleapis.com/v1beta/openai/"
 )
 
 
-def create_monster(query: str) -> AgentMonster:
-    creature = call_model(system_prompt=create_creature_system_prompt,
-                          user_prompt=query,
-                          output_schema_class=AgentMonster)
-    creature.init_basic_status()
-    return creature
-
-
 ## https://open.spotify.com/track/4LsLiCvF7whO3wNqgqS8Mo?si=337440aaef174b25
 
 
@@ -55,7 +55,6 @@ if __name__ == "__main__":
     game_environment = "这是一个现代都市的公园里。公园有路灯、秋千、沙坑、滑梯和跷跷板。周围有自动售货机。"
 
     # 初始化战斗
-    game_history = []
     active_agent, opponent = player, saber
 
     print("\n[战斗开始!]")
@@ -63,50 +62,40 @@ if __name__ == "__main__":
     print(f"对战双方: {active_agent.name} vs {opponent.name}")
     print("-" * 20)
 
-    observation = Observation()
-    battle_stat = dict()
-    battle_stat["power"] = 0
-    # 模拟 10 个回合
-    for turn in range(1, 20):
-        print(f"--- 第 {turn} 回合 ---")
-
-        observation = observe(active_agent, game_environment, game_history, observation.impression, battle_stat)
-        incoming_damage = observation.damage
-        if incoming_damage:
-            active_agent.hp -= incoming_damage
-
-        # 核心：调用 LLM 模拟一回合
-        action_result = simulate_turn(active_agent, game_environment, observation, game_history[-4:])  # 只传递最近2条历史记录
-
-        # 打印结果
-        print(f"🧠 [{active_agent.name} 的想法]: {action_result.get('thought', '无')}")
-        print(f"⚔️ [{active_agent.name} 的行动]: {action_result['action']}")
-        print(f"묘 [{action_result['description']}]")
-
-        if action_result["mana_cost"]:
-            active_agent.mp -= action_result["mana_cost"]
-
-
-        # 更新历史记录
-        game_history.append(f"第{turn}回合, {active_agent.name}: {action_result['description']}")
-        print(f"HP: {active_agent.hp} / MP: {active_agent.mp}")
-
-        if opponent.hp <= 0:
-            print(f"{active_agent.name} 胜利。")
+    replay = BattleReplay(character=player, opponent=saber, winner=0)
+    store = ArenaStore(ARENA_STORE) if ARENA_STORE else None
+    battle = store.new_battle() if store else None
+    combatants = (player, saber)
+    for event in run_battle(active_agent, opponent, game_environment, threshold=ADJUDICATION_THRESHOLD):
+        if isinstance(event, BattleResult):
+            result = event
+            if store:
+                store.record_result(battle, result, player, saber)
             break
 
-
-        # 交换行动方
-        active_agent, opponent = opponent, active_agent
-
+        print(f"--- 第 {event.turn} 回合 ---")
+        # 打印结果
+        print(f"🧠 [{event.actor} 的想法]: {event.action.thought or '无'}")
+        print(f"⚔️ [{event.actor} 的行动]: {event.action.action}")
+        print(f"묘 [{event.action.description}]")
+        print(f"HP: {event.hp} / MP: {event.mp}")
+        replay.record(player, saber)
+        if store:
+            store.record_turn(battle, event, combatants[event.side], combatants[1 - event.side])
+
+    if result.knockout:
+        print(f"{result.winner} 胜利。")
+    if result.adjudicated:
+        print(f"[裁定] {result.winner} 已占据压倒性优势，战斗提前结束。")
     print("\n--- 模拟结束 ---")
-    p1_hp_remains = check_health_loss(active_agent)
-    p2_hp_remains = check_health_loss(opponent)
+    replay.winner = result.winner_side
     print("Winner: ")
-    if p1_hp_remains > p2_hp_remains:
-        print(active_agent.name)
-    else:
-        print(opponent.name)
+    print(result.winner)
+
+    if BATTLE_REPLAYS:
+        save_replay(BATTLE_REPLAYS, replay)
+    if store:
+        store.close()
 
 # EXAMPLE
 """
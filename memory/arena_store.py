@@ -0,0 +1,337 @@
+import json
+import os
+import threading
+import time
+import zlib
+from array import array
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from entity.creature import AgentMonster, Skill
+
+ABILITIES = ("STR", "DEX", "CON", "INT", "WIS", "CHA", "LUC")
+
+# 列式存储的表结构：列名 -> array 类型码。字符串列以字典编码存为整数
+TURN_COLUMNS = {
+    "battle": "q",
+    "turn": "h",
+    **{f"actor_{ability}": "h" for ability in ABILITIES},
+    "actor_alignment": "I",
+    "opponent_alignment": "I",
+    "action": "I",
+    "skill": "I",
+    "action_type": "I",
+    "mana_cost": "i",
+    "power": "i",
+    "damage": "i",
+    "hp": "i",
+    "mp": "i",
+    "opponent_hp": "i",
+    "opponent_mp": "i",
+}
+OUTCOME_COLUMNS = {
+    "battle": "q",
+    "turns": "h",
+    "adjudicated": "b",
+    "winner_alignment": "I",
+    "loser_alignment": "I",
+}
+DICTIONARY_COLUMNS = {"actor_alignment", "opponent_alignment", "action", "skill", "action_type",
+                      "winner_alignment", "loser_alignment"}
+TABLES = {"turns": TURN_COLUMNS, "outcomes": OUTCOME_COLUMNS}
+
+DEFAULT_CHUNK_SIZE = 65536
+# 缓冲区中最早的一行超过该秒数后即写盘，避免数据长期只存在于内存
+DEFAULT_FLUSH_INTERVAL = 30.0
+
+
+def _typecode_range(typecode: str):
+    bits = array(typecode).itemsize * 8
+    if typecode.isupper():
+        return 0, (1 << bits) - 1
+    return -(1 << (bits - 1)), (1 << (bits - 1)) - 1
+
+
+# 各类型码可存放的取值范围，超出范围的数值写入时会被截断到边界
+TYPECODE_RANGES = {typecode: _typecode_range(typecode) for typecode in "bhiIq"}
+
+
+def match_skill(actor: AgentMonster, action) -> Optional[Skill]:
+    """
+    将 LLM 自由命名的行动对应到角色的技能：优先匹配行动名，其次匹配行动描述，
+    多个技能名都出现时取最长的一个。未使用列出的技能时返回 None。
+    """
+    for text in (action.action, action.description):
+        matches = [skill for skill in actor.skills
+                   if skill.name and (skill.name in text or text and text in skill.name)]
+        if matches:
+            return max(matches, key=lambda skill: len(skill.name))
+    return None
+
+
+def _atomic_write(path: Path, data: bytes):
+    """先写临时文件再替换，读者不会看到写了一半的文件"""
+    temp_path = path.with_name(path.name + ".tmp")
+    with open(temp_path, "wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+
+class ArenaStore:
+    """
+    战斗分析用的列式存储。
+
+    每张表按 chunk_size 行切分成块，每块一个文件；块内每列独立用 zlib 压缩，
+    查询时只解压需要的列。字符串（阵营、行动名、技能名、行动类型）统一字典编码为整数。
+    缓冲区满 chunk_size 行，或最早的一行已缓冲超过 flush_interval 秒时写成新块。
+
+    目录结构:
+        <root>/meta.json               # 字典与下一个 battle id
+        <root>/<table>/00000001.chunk  # 文件头一行 JSON 记录各列的偏移，其后为压缩后的列数据
+    """
+
+    def __init__(self, root, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL):
+        self.root = Path(root)
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._buffers = {table: self._empty(columns) for table, columns in TABLES.items()}
+        self._buffered_since: Dict[str, Optional[float]] = {table: None for table in TABLES}
+        self._load_meta()
+
+    def _load_meta(self):
+        meta_path = self.root / "meta.json"
+        if meta_path.exists():
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        else:
+            meta = {"next_battle": 0, "dictionary": []}
+        self._next_battle = meta["next_battle"]
+        self._dictionary: List[str] = meta["dictionary"]
+        self._codes = {value: code for code, value in enumerate(self._dictionary)}
+
+    @staticmethod
+    def _empty(columns: Dict[str, str]) -> Dict[str, array]:
+        return {name: array(typecode) for name, typecode in columns.items()}
+
+    # ---------- 写入 ----------
+
+    def encode(self, value: str) -> int:
+        """字典编码，未见过的字符串分配新的编码"""
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self._dictionary)
+            self._dictionary.append(value)
+            self._codes[value] = code
+        return code
+
+    def decode(self, code: int) -> str:
+        if code >= len(self._dictionary):
+            # 只读的查询进程可能落后于写入进程，重新读取字典
+            self._load_meta()
+        return self._dictionary[code]
+
+    def new_battle(self) -> int:
+        with self._lock:
+            battle = self._next_battle
+            self._next_battle += 1
+            return battle
+
+    def record_turn(self, battle: int, event, actor: AgentMonster, opponent: AgentMonster):
+        """记录一个 core.arena.TurnEvent，actor 为 event.side 对应的行动方"""
+        row = {
+            "battle": battle,
+            "turn": event.turn,
+            **{f"actor_{ability}": getattr(actor.ability_scores, ability) for ability in ABILITIES},
+            "actor_alignment": actor.alignment.abbreviation,
+            "opponent_alignment": opponent.alignment.abbreviation,
+            "action": event.action.action,
+            "skill": skill.name if (skill := match_skill(actor, event.action)) else "",
+            "action_type": event.action.type,
+            "mana_cost": event.action.mana_cost,
+            "power": event.action.power,
+            "damage": event.observation.damage,
+            "hp": event.hp,
+            "mp": event.mp,
+            "opponent_hp": event.opponent_hp,
+            "opponent_mp": event.opponent_mp,
+        }
+        self._append("turns", row)
+
+    def record_result(self, battle: int, result, character: AgentMonster, opponent: AgentMonster):
+        """记录一个 core.arena.BattleResult，character / opponent 分别对应 side 0 / 1"""
+        winner, loser = (character, opponent) if result.winner_side == 0 else (opponent, character)
+        row = {
+            "battle": battle,
+            "turns": result.turns,
+            "adjudicated": int(result.adjudicated),
+            "winner_alignment": winner.alignment.abbreviation,
+            "loser_alignment": loser.alignment.abbreviation,
+        }
+        self._append("outcomes", row)
+
+    @staticmethod
+    def _to_int(value, typecode: str) -> int:
+        """转换为整数并截断到类型码的范围内，无法转换的值（如 None）记为 0"""
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            return 0
+        low, high = TYPECODE_RANGES[typecode]
+        return min(max(value, low), high)
+
+    def _append(self, table: str, row: dict):
+        with self._lock:
+            # 先转换整行，全部成功后再追加，保证各列行数一致
+            values = [
+                self.encode(str(row[name])) if name in DICTIONARY_COLUMNS else self._to_int(row[name], typecode)
+                for name, typecode in TABLES[table].items()
+            ]
+            buffer = self._buffers[table]
+            for column, value in zip(buffer.values(), values):
+                column.append(value)
+            if self._buffered_since[table] is None:
+                self._buffered_since[table] = time.monotonic()
+            if len(buffer["battle"]) >= self.chunk_size or self._is_stale(table):
+                self._flush_table(table)
+
+    def _is_stale(self, table: str) -> bool:
+        since = self._buffered_since[table]
+        return since is not None and time.monotonic() - since >= self.flush_interval
+
+    def flush_stale(self):
+        """写出缓冲超过 flush_interval 秒的表；空闲时由调用方定期调用"""
+        with self._lock:
+            for table in TABLES:
+                if self._is_stale(table):
+                    self._flush_table(table)
+
+    def _flush_table(self, table: str):
+        buffer = self._buffers[table]
+        if not len(buffer["battle"]):
+            return
+        table_dir = self.root / table
+        table_dir.mkdir(parents=True, exist_ok=True)
+        chunk_id = len(list(table_dir.glob("*.chunk"))) + 1
+
+        blobs = [(name, zlib.compress(column.tobytes())) for name, column in buffer.items()]
+        header, offset = {"rows": len(buffer["battle"]), "columns": {}}, 0
+        for name, blob in blobs:
+            header["columns"][name] = [offset, len(blob)]
+            offset += len(blob)
+
+        # 块中的编码依赖字典：先保存字典（只追加，旧块仍可解码），再写入块
+        self._save_meta()
+        data = b"".join([json.dumps(header).encode("utf-8") + b"\n"] + [blob for _, blob in blobs])
+        _atomic_write(table_dir / f"{chunk_id:08d}.chunk", data)
+        self._buffers[table] = self._empty(TABLES[table])
+        self._buffered_since[table] = None
+
+    def _save_meta(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        meta = {"next_battle": self._next_battle, "dictionary": self._dictionary}
+        _atomic_write(self.root / "meta.json", json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+
+    def flush(self):
+        """将缓冲区写成新的块，并保存字典与 battle id"""
+        with self._lock:
+            for table in TABLES:
+                self._flush_table(table)
+            self._save_meta()
+
+    close = flush
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------- 查询 ----------
+
+    def scan(self, table: str, columns: Iterable[str]) -> Iterator[Dict[str, array]]:
+        """逐块产出所需列，每块为 列名 -> array"""
+        columns = list(columns)
+        typecodes = TABLES[table]
+        for path in sorted((self.root / table).glob("*.chunk")):
+            with open(path, "rb") as file:
+                header = json.loads(file.readline())
+                start = file.tell()
+                chunk = {}
+                for name in columns:
+                    offset, length = header["columns"][name]
+                    file.seek(start + offset)
+                    chunk[name] = array(typecodes[name], zlib.decompress(file.read(length)))
+                yield chunk
+
+    def group_mean(self, table: str, key: str, value: str, per: Optional[str] = None) -> Dict[str, float]:
+        """
+        按 key 分组求 value 的均值；给出 per 时求 sum(value) / sum(per)，例如每点MP的威力。
+        字典编码的 key 会被还原成字符串。
+        """
+        columns = [key, value] + ([per] if per else [])
+        totals = defaultdict(int)
+        weights = defaultdict(int)
+        for chunk in self.scan(table, columns):
+            keys, values = chunk[key], chunk[value]
+            weight_column = chunk[per] if per else None
+            if weight_column is None:
+                for k, v in zip(keys, values):
+                    totals[k] += v
+                    weights[k] += 1
+            else:
+                for k, v, w in zip(keys, values, weight_column):
+                    totals[k] += v
+                    weights[k] += w
+
+        decode = self.decode if key in DICTIONARY_COLUMNS else str
+        return {decode(k): totals[k] / weights[k] for k in totals if weights[k]}
+
+    def power_per_mana(self) -> Dict[str, float]:
+        """各技能的平均 power / mana_cost，忽略未对应到技能或不消耗MP的行动"""
+        totals = defaultdict(lambda: [0, 0])
+        for chunk in self.scan("turns", ["skill", "power", "mana_cost"]):
+            for skill, power, mana_cost in zip(chunk["skill"], chunk["power"], chunk["mana_cost"]):
+                if mana_cost > 0:
+                    total = totals[skill]
+                    total[0] += power
+                    total[1] += mana_cost
+        ratios = {self.decode(skill): power / mana_cost for skill, (power, mana_cost) in totals.items()}
+        # 空字符串表示行动未对应到任何技能
+        ratios.pop("", None)
+        return ratios
+
+    def win_rate(self, alignment: str, against: str) -> float:
+        """alignment 阵营对 against 阵营的胜率（按阵营缩写，例如 "LG" 对 "CE"）"""
+        alignment_code, against_code = self._codes.get(alignment), self._codes.get(against)
+        wins = losses = 0
+        for chunk in self.scan("outcomes", ["winner_alignment", "loser_alignment"]):
+            for winner, loser in zip(chunk["winner_alignment"], chunk["loser_alignment"]):
+                if winner == alignment_code and loser == against_code:
+                    wins += 1
+                elif winner == against_code and loser == alignment_code:
+                    losses += 1
+        return wins / (wins + losses) if wins + losses else 0.0
+
+    def win_rates_by_alignment(self) -> Dict[str, float]:
+        """各阵营的总体胜率"""
+        wins = defaultdict(int)
+        games = defaultdict(int)
+        for chunk in self.scan("outcomes", ["winner_alignment", "loser_alignment"]):
+            for winner, loser in zip(chunk["winner_alignment"], chunk["loser_alignment"]):
+                wins[winner] += 1
+                games[winner] += 1
+                games[loser] += 1
+        return {self.decode(code): wins[code] / games[code] for code in games}
+
+
+if __name__ == '__main__':
+    import sys
+
+    store = ArenaStore(sys.argv[1] if len(sys.argv) > 1 else "arena_store")
+    print("Win rate LG vs CE:", store.win_rate("LG", "CE"))
+    print("Win rate by alignment:", store.win_rates_by_alignment())
+    print("Power per mana by skill:", store.power_per_mana())